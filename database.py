@@ -87,6 +87,21 @@ async def add_user(user_id, username):
     """, user_id, username)
     await conn.close()
 
+async def add_users(users):
+    """Register many users in one round trip. users is a list of (user_id, username)."""
+    if not users:
+        return
+    conn = await connect_db()
+    try:
+        await conn.execute("""
+            INSERT INTO users (user_id, username)
+            SELECT * FROM unnest($1::BIGINT[], $2::TEXT[])
+            ON CONFLICT (user_id) DO UPDATE
+            SET username = EXCLUDED.username;
+        """, [user_id for user_id, _ in users], [username for _, username in users])
+    finally:
+        await conn.close()
+
 async def add_pending_link(user_id: int, link: str, original_message: str):
     """Add a new pending link for approval."""
     conn = await connect_db()
@@ -192,6 +207,65 @@ async def add_mute(user_id: int, muted_by: int, duration: int, reason: str = Non
     finally:
         await conn.close()
 
+async def add_mutes(user_ids, muted_by: int, duration: int, reason: str = None):
+    """Add mute records for many users at once."""
+    if not user_ids:
+        return
+    conn = await connect_db()
+    try:
+        # Ensure users exist
+        await conn.execute("""
+            INSERT INTO users (user_id)
+            SELECT * FROM unnest($1::BIGINT[])
+            ON CONFLICT (user_id) DO NOTHING
+        """, user_ids)
+
+        await conn.execute("""
+            INSERT INTO mutes (user_id, muted_by, duration_minutes, reason)
+            SELECT user_id, $2, $3, $4 FROM unnest($1::BIGINT[]) AS user_id
+        """, user_ids, muted_by, duration, reason)
+    finally:
+        await conn.close()
+
+async def get_active_mutes_by_reason(reason: str, max_age_minutes: int):
+    """
+    Get users with an active mute for reason from the last max_age_minutes.
+    Users muted again later for another reason are skipped.
+    """
+    conn = await connect_db()
+    try:
+        rows = await conn.fetch("""
+            SELECT DISTINCT m.user_id
+            FROM mutes m
+            WHERE m.reason = $1
+              AND m.active = TRUE
+              AND m.muted_at > CURRENT_TIMESTAMP - make_interval(mins => $2)
+              AND NOT EXISTS (
+                  SELECT 1 FROM mutes o
+                  WHERE o.user_id = m.user_id
+                    AND o.active = TRUE
+                    AND o.reason IS DISTINCT FROM $1
+                    AND o.muted_at >= m.muted_at
+              )
+        """, reason, max_age_minutes)
+        return [row['user_id'] for row in rows]
+    finally:
+        await conn.close()
+
+async def remove_mutes(user_ids, reason: str):
+    """Remove active mutes with the given reason for many users in one round trip."""
+    if not user_ids:
+        return
+    conn = await connect_db()
+    try:
+        await conn.execute("""
+            UPDATE mutes
+            SET active = FALSE
+            WHERE user_id = ANY($1::BIGINT[]) AND reason = $2 AND active = TRUE
+        """, user_ids, reason)
+    finally:
+        await conn.close()
+
 async def remove_mute(user_id: int):
     """Remove active mute for user."""
     conn = await connect_db()
@@ -1,6 +1,8 @@
 import logging
-from telegram import Update, ChatPermissions, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, CallbackContext
+from telegram import Update, ChatMember, ChatPermissions, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import Application, ChatMemberHandler, CommandHandler, MessageHandler, CallbackQueryHandler, filters, CallbackContext
+from telegram.error import RetryAfter
+from datetime import datetime, timedelta, timezone
 import re
 import sys
 import database
@@ -16,11 +18,29 @@ TOKEN = os.getenv("BOT_TOKEN")
 
 # Group configuration
 ALLOWED_GROUP_ID = -1002165335366  # Updated with your actual group ID from logs
-ADMINS = {7951420571, 136817688}
+LINK_REVIEWERS = {7951420571, 136817688}  # Receive link approval requests by DM; approving still requires ADMINS
+# Loaded from the group's administrators at startup. The reviewer ids are only a
+# fallback until the first successful load, after which the set mirrors the group.
+ADMINS = set(LINK_REVIEWERS)
+ADMIN_CACHE_TTL = 600  # seconds between admin list refreshes
+admin_refresh_task = None
+# Promotions and demotions seen while a refresh is in flight, keyed by user id
+admin_changes = None
 
 # Maximum warnings before ban
 MAX_WARNINGS = 3
 
+# Join flood handling
+JOIN_BATCH_WINDOW = 5  # seconds to collect joins before welcoming them together
+WELCOME_NAME_LIMIT = 20  # names listed in one combined welcome message
+RAID_THRESHOLD = 10  # joins within one window that count as a raid
+RAID_MODE = os.getenv("RAID_MODE", "false").lower() == "true"  # restrict all new joiners
+RAID_AUTO = os.getenv("RAID_AUTO", "false").lower() == "true"  # turn raid mode on when a flood is detected
+RAID_MUTE_REASON = "Mod raid"  # mute reason recorded for raid restrictions
+RAID_RESTRICT_MINUTES = 60  # how long raid mode restricts new joiners
+RAID_RESTRICT_CONCURRENCY = 5  # restrict calls in flight at once
+RAID_RESTRICT_RETRIES = 3  # attempts per member when rate limited
+
 # Update logging configuration to be simpler
 logging.basicConfig(
     format='%(levelname)s: %(message)s',
@@ -47,6 +67,19 @@ WELCOME_MESSAGE = """
 🤖 Bot kami akan memantau aktiviti anda.
 """
 
+RAID_NOTICE = "🚨 Mod raid aktif. Ahli baru telah dihadkan selama {minutes} minit sementara admin menyemak."
+
+# New members waiting to be welcomed, keyed by user id
+pending_joins = {}
+join_flush_task = None
+
+# Raid restrictions started for the current batch, recorded when it is flushed
+pending_restrictions = []
+
+# Restrict calls share one concurrency limit and one flood wait (event loop time)
+restrict_semaphore = asyncio.Semaphore(RAID_RESTRICT_CONCURRENCY)
+restrict_not_before = 0.0
+
 def is_from_allowed_group(update: Update) -> bool:
     """Check if the message is from the allowed group."""
     if not update.effective_chat:
@@ -287,8 +320,8 @@ async def handle_links(update: Update, context: CallbackContext):
             ]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            # Send message to all admins
-            for admin_id in ADMINS:
+            # Send message to link reviewers
+            for admin_id in LINK_REVIEWERS:
                 try:
                     await context.bot.send_message(
                         chat_id=admin_id,
@@ -379,23 +412,269 @@ async def get_chat_id(update: Update, context: CallbackContext):
 
 async def welcome_new_member(update: Update, context: CallbackContext):
     """Welcome new members when they join."""
+    global join_flush_task, RAID_MODE
+
     if not is_from_allowed_group(update):
         return
-        
-    for member in update.message.new_chat_members:
-        if not member.is_bot:  # Don't welcome bots
-            try:
-                # Add user to database
-                await database.add_user(member.id, member.username)
-                # Send welcome message and schedule deletion after 15 minutes
-                welcome_msg = await update.message.reply_text(
-                    WELCOME_MESSAGE.format(
-                        username=member.username or member.first_name
+
+    new_members = [member for member in update.message.new_chat_members if not member.is_bot]  # Don't welcome bots
+    for member in new_members:
+        pending_joins[member.id] = member
+
+    if RAID_AUTO and not RAID_MODE and len(pending_joins) >= RAID_THRESHOLD:
+        RAID_MODE = True
+        # Restrict the whole burst, not only this update's members
+        new_members = list(pending_joins.values())
+        logger.warning(f"Raid mode enabled automatically after {len(pending_joins)} joins")
+
+    # Restrict raiders as soon as they join; only the welcome waits for the batch
+    if RAID_MODE and new_members:
+        pending_restrictions.append(asyncio.create_task(restrict_new_members(context.bot, new_members)))
+
+    # Joins arriving within the window are welcomed together
+    if pending_joins and join_flush_task is None:
+        join_flush_task = asyncio.create_task(flush_new_members_later(context.bot))
+
+async def flush_new_members_later(bot):
+    """Flush new members once the batch window has passed."""
+    global join_flush_task
+
+    await asyncio.sleep(JOIN_BATCH_WINDOW)
+    join_flush_task = None
+    await flush_new_members(bot)
+
+async def flush_pending_joins(bot):
+    """Flush new members now instead of waiting for the batch window."""
+    global join_flush_task
+
+    if join_flush_task:
+        join_flush_task.cancel()
+        join_flush_task = None
+    await flush_new_members(bot)
+
+async def flush_new_members(bot):
+    """Register and welcome all members collected during the batch window."""
+    members = list(pending_joins.values())
+    pending_joins.clear()
+    restrictions = list(pending_restrictions)
+    pending_restrictions.clear()
+    if not members:
+        return
+
+    restricted = []
+    for user_ids in await asyncio.gather(*restrictions):
+        restricted.extend(user_ids)
+
+    try:
+        # Add all users to database in one query
+        await database.add_users([(member.id, member.username) for member in members])
+    except Exception as e:
+        logger.error(f"Error registering new members: {e}")
+
+    try:
+        await database.add_mutes(restricted, bot.id, RAID_RESTRICT_MINUTES, RAID_MUTE_REASON)
+    except Exception as e:
+        logger.error(f"Error recording raid mutes: {e}")
+
+    if len(members) >= RAID_THRESHOLD:
+        await alert_join_flood(bot, len(members))
+
+    try:
+        names = [member.username or member.first_name for member in members[:WELCOME_NAME_LIMIT]]
+        username = ", ".join(names)
+        if len(members) > WELCOME_NAME_LIMIT:
+            username += f" dan {len(members) - WELCOME_NAME_LIMIT} lagi"
+        text = WELCOME_MESSAGE.format(username=username)
+        if restricted:
+            text += "\n" + RAID_NOTICE.format(minutes=RAID_RESTRICT_MINUTES)
+
+        # Send one welcome message and schedule deletion after 15 minutes
+        welcome_msg = await bot.send_message(chat_id=ALLOWED_GROUP_ID, text=text)
+        asyncio.create_task(delete_message_later(welcome_msg, 900))  # 15 minutes = 900 seconds
+    except Exception as e:
+        logger.error(f"Error welcoming new members: {e}")
+
+async def alert_join_flood(bot, count: int):
+    """Notify link reviewers that a join flood was detected."""
+    logger.warning(f"Join flood detected: {count} members in {JOIN_BATCH_WINDOW}s")
+    status = "Mod raid aktif." if RAID_MODE else "Guna /raid on untuk menghadkan ahli baru."
+    for reviewer_id in LINK_REVIEWERS:
+        try:
+            await bot.send_message(
+                chat_id=reviewer_id,
+                text=f"🚨 {count} ahli baru menyertai kumpulan dalam {JOIN_BATCH_WINDOW} saat. {status}"
+            )
+        except Exception as e:
+            logger.error(f"Gagal menghantar amaran raid kepada {reviewer_id}: {e}")
+
+async def wait_for_restrict_backoff():
+    """Sleep until the shared flood wait for restrict calls has passed."""
+    loop = asyncio.get_running_loop()
+    delay = restrict_not_before - loop.time()
+    while delay > 0:
+        await asyncio.sleep(delay)
+        delay = restrict_not_before - loop.time()
+
+async def set_members_permissions(bot, user_ids, permissions, until_date=None):
+    """
+    Apply chat permissions to many members with limited concurrency.
+    Returns the ids that were updated successfully.
+    """
+    async def apply(user_id):
+        global restrict_not_before
+
+        async with restrict_semaphore:
+            for attempt in range(RAID_RESTRICT_RETRIES):
+                await wait_for_restrict_backoff()
+                try:
+                    await bot.restrict_chat_member(
+                        ALLOWED_GROUP_ID,
+                        user_id,
+                        permissions,
+                        until_date=until_date
                     )
-                )
-                asyncio.create_task(delete_message_later(welcome_msg, 900))  # 15 minutes = 900 seconds
-            except Exception as e:
-                logger.error(f"Error welcoming new member: {e}")
+                    return
+                except RetryAfter as e:
+                    if attempt == RAID_RESTRICT_RETRIES - 1:
+                        raise
+                    # All workers wait out the flood wait before their next call
+                    loop = asyncio.get_running_loop()
+                    restrict_not_before = max(restrict_not_before, loop.time() + e.retry_after)
+
+    results = await asyncio.gather(*(apply(user_id) for user_id in user_ids), return_exceptions=True)
+
+    updated = []
+    failed = []
+    for user_id, result in zip(user_ids, results):
+        if isinstance(result, Exception):
+            failed.append(user_id)
+            logger.error(f"Error updating permissions for member {user_id}: {result}")
+        else:
+            updated.append(user_id)
+    if failed:
+        logger.error(f"Failed to update permissions for {len(failed)} of {len(user_ids)} members: {failed}")
+    return updated
+
+async def restrict_new_members(bot, members):
+    """Restrict new members from sending messages for RAID_RESTRICT_MINUTES."""
+    until_date = datetime.now(timezone.utc) + timedelta(minutes=RAID_RESTRICT_MINUTES)
+    return await set_members_permissions(
+        bot,
+        [member.id for member in members],
+        ChatPermissions(can_send_messages=False),
+        until_date=until_date
+    )
+
+async def lift_raid_restrictions(bot):
+    """Unmute members whose raid restriction has not expired yet."""
+    # Record restrictions still waiting for the batch window first
+    await flush_pending_joins(bot)
+
+    user_ids = await database.get_active_mutes_by_reason(RAID_MUTE_REASON, RAID_RESTRICT_MINUTES)
+    lifted = await set_members_permissions(bot, user_ids, ChatPermissions(can_send_messages=True))
+    # Failed members keep their active mute so the next /raid off tries them again
+    await database.remove_mutes(lifted, RAID_MUTE_REASON)
+    return lifted
+
+async def raid(update: Update, context: CallbackContext):
+    """Turn raid mode on or off."""
+    global RAID_MODE
+
+    if not is_from_allowed_group(update) or update.message.from_user.id not in ADMINS:
+        return
+
+    if not context.args or context.args[0].lower() not in ("on", "off"):
+        await handle_mod_command(update, None, "Sila nyatakan on atau off. Contoh: /raid on")
+        return
+
+    RAID_MODE = context.args[0].lower() == "on"
+    if RAID_MODE:
+        await handle_mod_command(update, "🛡 Mod raid telah diaktifkan.", delete_after=3)
+        return
+
+    try:
+        lifted = await lift_raid_restrictions(context.bot)
+        await handle_mod_command(
+            update,
+            f"🛡 Mod raid telah dinyahaktifkan. {len(lifted)} ahli baru telah dinyahbisu.",
+            delete_after=3
+        )
+    except Exception as e:
+        await handle_mod_command(update, None, str(e))
+
+async def refresh_admins(bot):
+    """Reload the admin set from the group's administrators."""
+    global admin_changes
+
+    admin_changes = {}
+    try:
+        administrators = await bot.get_chat_administrators(ALLOWED_GROUP_ID)
+    finally:
+        changes = admin_changes
+        admin_changes = None
+
+    admin_ids = {admin.user.id for admin in administrators if not admin.user.is_bot}
+    # Changes that arrived during the request are newer than the fetched list
+    for user_id, is_admin in changes.items():
+        if is_admin:
+            admin_ids.add(user_id)
+        else:
+            admin_ids.discard(user_id)
+    # Update in place so permission checks keep using the same set
+    ADMINS.clear()
+    ADMINS.update(admin_ids)
+    logger.info(f"Loaded {len(ADMINS)} admins from group")
+
+async def refresh_admins_periodically(bot):
+    """Refresh the admin set every ADMIN_CACHE_TTL seconds."""
+    while True:
+        await asyncio.sleep(ADMIN_CACHE_TTL)
+        try:
+            await refresh_admins(bot)
+        except Exception as e:
+            logger.error(f"Error refreshing admins: {e}")
+
+async def track_admin_changes(update: Update, context: CallbackContext):
+    """Keep the admin set in sync with promotions and demotions."""
+    chat_member = update.chat_member
+    if chat_member.chat.id != ALLOWED_GROUP_ID:
+        return
+
+    new_member = chat_member.new_chat_member
+    if new_member.user.is_bot:
+        return
+
+    is_admin = new_member.status in (ChatMember.OWNER, ChatMember.ADMINISTRATOR)
+    if is_admin:
+        ADMINS.add(new_member.user.id)
+    else:
+        ADMINS.discard(new_member.user.id)
+
+    if admin_changes is not None:
+        admin_changes[new_member.user.id] = is_admin
+
+async def post_init(application: Application):
+    """Load admins at startup and start the refresh loop."""
+    global admin_refresh_task
+
+    try:
+        await refresh_admins(application.bot)
+    except Exception as e:
+        logger.error(f"Error loading admins, using fallback list: {e}")
+    admin_refresh_task = asyncio.create_task(refresh_admins_periodically(application.bot))
+
+async def post_stop(application: Application):
+    """Welcome members still waiting for the batch window while the bot can send."""
+    await flush_pending_joins(application.bot)
+
+async def post_shutdown(application: Application):
+    """Stop the admin refresh loop."""
+    if admin_refresh_task:
+        admin_refresh_task.cancel()
+        try:
+            await admin_refresh_task
+        except asyncio.CancelledError:
+            pass
 
 def init_database():
     """Initialize database in a separate process."""
@@ -415,7 +694,7 @@ if __name__ == "__main__":
             sys.exit(1)
 
         # Create and configure application
-        app = Application.builder().token(TOKEN).build()
+        app = Application.builder().token(TOKEN).post_init(post_init).post_stop(post_stop).post_shutdown(post_shutdown).build()
         
         # Add command handlers
         app.add_handler(CommandHandler("mute", mute))
@@ -425,8 +704,12 @@ if __name__ == "__main__":
         app.add_handler(CommandHandler("approve", approve_link))
         app.add_handler(CommandHandler("pending", show_pending_links))
         app.add_handler(CommandHandler("warn", warn))
+        app.add_handler(CommandHandler("raid", raid))
         app.add_handler(CommandHandler("chatid", get_chat_id))
         
+        # Keep admin set in sync with chat member updates
+        app.add_handler(ChatMemberHandler(track_admin_changes, ChatMemberHandler.CHAT_MEMBER))
+
         # Add callback handler for buttons
         app.add_handler(CallbackQueryHandler(handle_button))
         